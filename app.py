@@ -12,10 +12,14 @@ import io
 excel_data = 'donkey'
 async def start_matching(csv_file_path, image_files_path):
     print(f"[mistral_ocr] Received folder_path: {image_files_path}") # DEBUG
-    ocr_df = await mistral_ocr(image_files_path)
+    # Amounts of the statement, receipts whose locally read total is not among them are sent to the LLM
+    statement_amounts = set(pd.to_numeric(pd.read_csv(csv_file_path)['amount'], errors='coerce').dropna().round(2))
+    ocr_df = await mistral_ocr(image_files_path, statement_amounts)
     assigned_df, unassigned_df = data_matching(csv_file_path, ocr_df)
     st.session_state.assigned_df = assigned_df
     st.session_state.unassigned_df = unassigned_df
+    st.session_state.duplicate_receipts = ocr_df.attrs.get('duplicates', {})
+    st.session_state.suspected_duplicate_receipts = ocr_df.attrs.get('suspected_duplicates', {})
 
 
 
@@ -151,6 +155,10 @@ with right_main:
                         asyncio.set_event_loop(loop)
                     loop.run_until_complete(start_matching(statements_tempdir + r'/' + uploaded_csvs[0].name, receipts_tempdir))
                     st.success("Matching process")
+                    for duplicate, original in st.session_state.duplicate_receipts.items():
+                        st.warning(f"{duplicate} looks like a duplicate of {original} and was not matched.")
+                    for duplicate, original in st.session_state.suspected_duplicate_receipts.items():
+                        st.info(f"{duplicate} looks similar to {original}, check it is not the same receipt.")
                     # Convert the DataFrame to Excel bytes
                     excel_data = convert_df_to_excel(st.session_state.assigned_df)
 
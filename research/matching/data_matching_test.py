@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+from research.matching import matching
+
+
+class LetterCountModel:
+    """Stands in for the sentence transformer: one dimension per letter."""
+
+    def encode(self, sentences):
+        vectors = np.zeros((len(sentences), 26))
+        for i, sentence in enumerate(sentences):
+            for char in sentence.lower():
+                if 'a' <= char <= 'z':
+                    vectors[i, ord(char) - ord('a')] += 1
+        return vectors + 1e-6
+
+
+def test_misread_amounts_are_matched_after_exact_amounts(tmp_path, monkeypatch):
+    monkeypatch.setattr(matching, 'SentenceTransformer', lambda model_name: LetterCountModel())
+    statement = [
+        ('2024-03-05', 'CB BOULANGERIE PAUL 05/03', 4.20),
+        ('2024-03-05', 'CB BOULANGERIE PAUL 05/03', 12.60),
+        ('2024-03-05', 'CB PHARMACIE DU CENTRE 05/03', 8.00),
+        ('2024-03-05', 'CB PHARMACIE DU CENTRE 05/03', 9.50),
+    ]
+    # A regular shop, frequent in the statement
+    statement += [(f'2024-03-{day:02d}', f'CB CARREFOUR {day:02d}/03', 30.0 + day) for day in range(7, 17)]
+    statement += [(f'2024-03-{day:02d}', f'PRLV SEPA ABONNEMENT {day}', 15.0) for day in range(7, 12)]
+    statement_path = tmp_path / 'statement.csv'
+    pd.DataFrame(statement, columns=['date', 'vendor', 'amount']).to_csv(statement_path, index=False)
+
+    ocr_df = pd.DataFrame({
+        'filename': ['pharmacie_a.jpg', 'pharmacie_b.jpg', 'paul.jpg', 'carrefour.jpg'],
+        'date_of_purchase': ['2024-03-05', '2024-03-05', '2024-03-05', '2024-03-10'],
+        'name_of_store': ['Pharmacie du Centre', 'Pharmacie du Centre', 'Boulangerie Paul', 'Carrefour'],
+        'address': ['', '', '', ''],
+        # pharmacie_a, paul and carrefour totals were misread by the OCR
+        'total_price': [9.00, 8.00, 12.80, 40.50],
+        'currency': ['EUR'] * 4,
+    })
+
+    whole_df, missing_pictures = matching.data_matching(str(statement_path), ocr_df)
+
+    assigned = whole_df['assigned_picture']
+    # The exact amount wins even though the misread receipt comes first
+    assert assigned[2] == 'pharmacie_b.jpg'
+    assert assigned[3] == 'pharmacie_a.jpg'
+    # Same shop, same day: the amount closest to the misread total
+    assert assigned[1] == 'paul.jpg'
+    assert assigned[0] == ''
+    # Carrefour is frequent in the statement but alone on its day
+    assert assigned[7] == 'carrefour.jpg'
+    assert missing_pictures == []
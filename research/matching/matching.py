@@ -7,6 +7,7 @@ from dateutil import parser
 from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
 import glob
+from research.matching.vendor_index import build_vendor_index, block_candidates, indexed_description
 
 # On oublie ces lignes là, il faut juste fournir un csv en entrée à la place et le convertir en dataframe
 
@@ -30,15 +31,24 @@ whole_df = pd.concat(df_list)
 whole_df.reset_index(drop=True, inplace=True)
 """
 
+def get_similarities_with_transformer(query, candidates, model):
+    """
+    Retourne la similarité cosinus entre `query` et chaque élément de la liste `candidates`
+    """
+    embeddings = model.encode([query] + candidates)
+    return cosine_similarity([embeddings[0]], embeddings[1:])[0]
+
 def get_best_match_with_transformer(query, candidates, model):
     """
     Retourne l'élément de la liste `candidates` le plus similaire à `query`
     """
-    embeddings = model.encode([query] + candidates)
-    similarities = cosine_similarity([embeddings[0]], embeddings[1:])[0]
+    similarities = get_similarities_with_transformer(query, candidates, model)
     best_idx = similarities.argmax()
     return candidates[best_idx], similarities[best_idx]
 
+# Similarité minimale pour assigner une image dont le montant n'a trouvé aucune ligne
+VENDOR_SIMILARITY_THRESHOLD = 0.6
+
 def data_matching(source_csv, ocr_df):
 
     #Pre-traitement des données OCR d'entrée
@@ -80,6 +90,12 @@ def data_matching(source_csv, ocr_df):
     # Les colonnes rajoutées pour assigner l'image et pour éliminer les lignes assignées des futures itérations
     whole_df['checked'] = False
     whole_df['assigned_picture'] = ''
+
+    # Index des mots des libellés bancaires normalisés, calculé une seule fois pour tout le relevé
+    vendor_index = build_vendor_index(whole_df['vendor'])
+
+    # Tickets dont le montant ne correspond à aucune ligne, traités après tous les montants exacts
+    deferred_receipts = []
     
     # Start matching
     for index, row in ocr_output.iterrows():
@@ -99,6 +115,11 @@ def data_matching(source_csv, ocr_df):
             whole_df.loc[match_index, 'checked'] = True
             whole_df.loc[match_index, 'assigned_picture'] = row['filename']
             continue
+
+        # Si aucun montant ne correspond, l'OCR a pu mal lire le prix: on réessaie par le vendeur au second passage
+        if filtered_df.empty:
+            deferred_receipts.append(row)
+            continue
     
         # On check la date, de manière rigide
         filtered_df = filtered_df[filtered_df['date'] == row['date_of_purchase']]
@@ -112,11 +133,32 @@ def data_matching(source_csv, ocr_df):
         # On check le nom du vendeur, en retenant le plus similaire
         if not filtered_df.empty:
             # Matching du nom du vendeur, on retient le meilleur et on l'assigne à la ligne dans le dataframe du relevé bancaire selon l'index
-            candidate_vendors = filtered_df['vendor'].astype(str).tolist()
-            best_vendor, score = get_best_match_with_transformer(row['vendor'], candidate_vendors, model=model)
-            best_index = filtered_df[filtered_df['vendor'] == best_vendor].index[0]
+            candidate_vendors = [indexed_description(vendor_index, vendor) for vendor in filtered_df['vendor']]
+            best_vendor, score = get_best_match_with_transformer(indexed_description(vendor_index, row['vendor']), candidate_vendors, model=model)
+            best_index = filtered_df.index[candidate_vendors.index(best_vendor)]
             whole_df.loc[best_index, 'checked'] = True
             whole_df.loc[best_index, 'assigned_picture'] = row['filename']
+
+    # Second passage: pour les tickets sans montant correspondant, on cherche parmi les lignes restantes du même jour
+    # celles qui partagent des mots rares avec le vendeur. Parmi celles dont le vendeur est suffisamment proche,
+    # on retient le montant le plus proche du montant lu, puis le vendeur le plus similaire
+    for row in deferred_receipts:
+        same_date_df = whole_df[(whole_df['assigned_picture'] == '') &
+                                (whole_df['date'] == row['date_of_purchase'])]
+        blocked_indices = block_candidates(vendor_index, row['vendor'], allowed_indices=same_date_df.index, limit=None)
+        if not blocked_indices:
+            continue
+        filtered_df = whole_df.loc[blocked_indices]
+        candidate_vendors = [indexed_description(vendor_index, vendor) for vendor in filtered_df['vendor']]
+        similarities = get_similarities_with_transformer(indexed_description(vendor_index, row['vendor']), candidate_vendors, model=model)
+        close_vendors = [(abs(amount - row['total_price']) if pd.notna(amount) else float('inf'), -similarity, position)
+                         for position, (amount, similarity) in enumerate(zip(filtered_df['amount'], similarities))
+                         if similarity >= VENDOR_SIMILARITY_THRESHOLD]
+        if not close_vendors:
+            continue
+        best_index = filtered_df.index[min(close_vendors)[2]]
+        whole_df.loc[best_index, 'checked'] = True
+        whole_df.loc[best_index, 'assigned_picture'] = row['filename']
     
     # On retient les images qui n'ont pas trouvé de match pour les montrer à l'utilisateur
     picture_list = ocr_output['filename'].tolist()
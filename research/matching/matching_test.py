@@ -5,6 +5,7 @@ import os
 import numpy as np
 from dateutil import parser
 from datetime import timedelta, datetime # Import timedelta for date comparison
+from research.matching.vendor_index import build_vendor_index, block_candidates, indexed_description
 
 # --- Configuration ---
 PATH_TO_CSV_FOLDER = "research/matching/bank_statements"
@@ -110,6 +111,11 @@ def matching_function(
     unassigned_pictures_list = []
     date_tolerance = timedelta(days=DATE_TOLERANCE_DAYS)
 
+    # Normalize each bank description once and index its tokens, used to block vendor matching candidates
+    vendor_index = build_vendor_index(whole_df['vendor'])
+    # Receipts without any amount match, retried on vendor tokens once every exact amount has been assigned
+    deferred_receipts = []
+
     # Iterate through each receipt (OCR output row)
     for ocr_index, ocr_row in ocr_output.iterrows():
         picture_entry = ocr_row['filename']
@@ -129,8 +135,8 @@ def matching_function(
         print(f"  Found {len(amount_matches)} potential matches based on amount.")
 
         if amount_matches.empty:
-            print(f"  No amount match found.")
-            unassigned_pictures_list.append({ 'filename': picture_entry, 'reason': 'No amount match', 'amount': amount_entry})
+            print(f"  No amount match found, retrying on vendor tokens after the exact amount matches.")
+            deferred_receipts.append(ocr_row)
             continue # Move to the next receipt
 
         if len(amount_matches) == 1:
@@ -191,7 +197,7 @@ def matching_function(
         # This block executes if 'matched' is still False and 'candidates_for_vendor_match' is not empty
         if not matched and not candidates_for_vendor_match.empty:
             print(f"  Performing vendor match using RapidFuzz on {len(candidates_for_vendor_match)} candidates...")
-            vendor_list = candidates_for_vendor_match['vendor'].tolist()
+            vendor_list = [indexed_description(vendor_index, vendor) for vendor in candidates_for_vendor_match['vendor']]
             candidate_indices = candidates_for_vendor_match.index.tolist() # Original DataFrame indices
 
             # Ensure vendor_entry is a non-empty string for matching
@@ -200,7 +206,7 @@ def matching_function(
                     # Use rapidfuzz.process.extractOne to find the best match ABOVE the threshold
                     # process.extractOne returns (choice, score, index_in_choice_list) or None
                     best_match_tuple = process.extractOne(
-                        vendor_entry,
+                        indexed_description(vendor_index, vendor_entry),
                         vendor_list,
                         scorer=fuzz.WRatio,  # Weighted Ratio is often good for vendor names (handles token order)
                                             # Other good options: fuzz.ratio, fuzz.partial_ratio, fuzz.token_sort_ratio
@@ -247,6 +253,52 @@ def matching_function(
             if not any(d['filename'] == picture_entry for d in unassigned_pictures_list):
                 unassigned_pictures_list.append({ 'filename': picture_entry, 'reason': 'Failed vendor match or ambiguity'})
 
+    # --- Step 5: Receipts without amount match, the OCR may have misread the amount ---
+    # Run after every exact amount match so that these receipts cannot take a row matching another receipt's amount
+    for ocr_row in deferred_receipts:
+        picture_entry = ocr_row['filename']
+        amount_entry = ocr_row['total_price']
+        date_entry = ocr_row['parsed_date']
+        vendor_entry = ocr_row['vendor_address']
+
+        print(f"\nMatching Receipt on vendor tokens: {picture_entry} (Amount: {amount_entry}, Vendor: {vendor_entry[:50]}...)")
+
+        # Filter on dates first so that the blocking only ranks rows which can actually match
+        candidate_df = whole_df.loc[~whole_df['checked']]
+        nearby_date_rows = candidate_df[(candidate_df['date'] - date_entry).abs() <= date_tolerance]
+        blocked_indices = block_candidates(vendor_index, vendor_entry, allowed_indices=nearby_date_rows.index, limit=None)
+        if not blocked_indices:
+            print(f"  No candidate shares rare vendor tokens within {DATE_TOLERANCE_DAYS} days.")
+            unassigned_pictures_list.append({ 'filename': picture_entry, 'reason': 'No amount match', 'amount': amount_entry})
+            continue
+
+        print(f"  Performing vendor match using RapidFuzz on {len(blocked_indices)} candidates...")
+        vendor_list = [indexed_description(vendor_index, vendor) for vendor in whole_df.loc[blocked_indices, 'vendor']]
+        vendor_matches = process.extract(
+            indexed_description(vendor_index, vendor_entry),
+            vendor_list,
+            scorer=fuzz.WRatio,
+            score_cutoff=VENDOR_MATCH_THRESHOLD,
+            limit=None
+        )
+        if not vendor_matches:
+            print(f"  No vendor match found above threshold {VENDOR_MATCH_THRESHOLD} using RapidFuzz.")
+            unassigned_pictures_list.append({ 'filename': picture_entry, 'reason': 'No amount match, no vendor match above threshold', 'amount': amount_entry})
+            continue
+
+        # Among the close enough vendors, prefer the amount closest to the misread one, then the best vendor score
+        def amount_gap(vendor_match):
+            amount = whole_df.loc[blocked_indices[vendor_match[2]], 'amount']
+            return abs(amount - amount_entry) if pd.notna(amount) else float('inf')
+
+        best_matching_vendor, score, list_index = min(vendor_matches, key=lambda vendor_match: (amount_gap(vendor_match), -vendor_match[1]))
+        match_index = blocked_indices[list_index]
+        print(f"  Best vendor match found: '{best_matching_vendor}' (Score: {score:.2f}) at original index {match_index}.")
+        whole_df.loc[match_index, 'checked'] = True
+        whole_df.loc[match_index, 'assigned_picture'] = picture_entry
+        whole_df.loc[match_index, 'match_type'] = 'Vendor Tokens / No Amount Match (RapidFuzz)'
+        whole_df.loc[match_index, 'match_score'] = score
+
 
     # --- Save Results ---
     print("\nSaving results...")
@@ -0,0 +1,102 @@
+import math
+import re
+import unicodedata
+from collections import defaultdict
+
+# Bank descriptions carry payment prefixes, card numbers, dates and references around the vendor name
+DATE_PATTERN = re.compile(r'\b\d{1,4}[/.-]\d{1,2}(?:[/.-]\d{1,4})?\b')
+CARD_NUMBER_PATTERN = re.compile(r'\b[x*]{2,}\s*\d+\b|\b\d{4}[x*]{4,}\d*\b')
+NON_ALPHANUMERIC_PATTERN = re.compile(r'[^a-z0-9]+')
+NOISE_TOKENS = {
+    'cb', 'carte', 'paypal', 'sumup', 'zettle', 'izettle', 'sq', 'stripe', 'achat', 'paiement', 'pmt', 'prlv', 'sepa',
+    'vir', 'virement', 'facture', 'card', 'pos', 'purchase', 'payment', 'ref', 'nan', 'none',
+}
+# Tokens present in more than this share of the statement (or of the allowed rows) are not used for blocking
+MAX_DOCUMENT_FREQUENCY = 0.1
+MAX_CANDIDATES = 20
+
+
+def normalize_description(description):
+    """
+    Returns the vendor part of a bank description or OCR vendor, lowercased and without accents,
+    e.g. 'CB*CARREFOUR MKT 12/03 CARTE 4974XXXX1234' -> 'carrefour mkt'.
+    """
+    text = unicodedata.normalize('NFKD', str(description)).encode('ascii', 'ignore').decode('ascii').lower()
+    text = DATE_PATTERN.sub(' ', text)
+    text = CARD_NUMBER_PATTERN.sub(' ', text)
+    text = NON_ALPHANUMERIC_PATTERN.sub(' ', text)
+    # Reference codes and amounts are mostly digits, a vendor name misread by the OCR ('carref0ur') is kept
+    tokens = [token for token in text.split()
+              if len(token) > 1 and token not in NOISE_TOKENS and 2 * sum(char.isdigit() for char in token) < len(token)]
+    return ' '.join(tokens)
+
+
+def description_tokens(normalized_description):
+    """
+    Returns the words of a normalized description and their character trigrams,
+    trigrams let a vendor misread by the OCR still share tokens with the bank description.
+    """
+    tokens = set()
+    for word in normalized_description.split():
+        tokens.add(word)
+        padded = f' {word} '
+        tokens.update('#' + padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(tokens)
+
+
+def build_vendor_index(descriptions):
+    """
+    Builds an inverted index from the tokens of the normalized descriptions to the row indices.
+    Args:
+        descriptions (pd.Series): The bank statement descriptions, indexed like the statement dataframe.
+    Returns:
+        dict: {'postings': {token: set of row indices}, 'size': number of rows,
+               'normalized': {description: normalized description}}
+    """
+    # Each unique description is normalized once, the memo lives with the index so it is freed with the statement
+    vendor_index = {'postings': defaultdict(set), 'size': len(descriptions), 'normalized': {}}
+    for row_index, description in descriptions.items():
+        for token in description_tokens(indexed_description(vendor_index, description)):
+            vendor_index['postings'][token].add(row_index)
+    vendor_index['postings'] = dict(vendor_index['postings'])
+    return vendor_index
+
+
+def indexed_description(vendor_index, description):
+    """Returns the normalized description, memoized in the vendor index."""
+    key = str(description)
+    normalized = vendor_index['normalized'].get(key)
+    if normalized is None:
+        normalized = normalize_description(key)
+        vendor_index['normalized'][key] = normalized
+    return normalized
+
+
+def block_candidates(vendor_index, query, allowed_indices=None, max_document_frequency=MAX_DOCUMENT_FREQUENCY,
+                     limit=MAX_CANDIDATES):
+    """
+    Returns the row indices sharing rare tokens with the query vendor, best first (sum of the shared tokens IDF).
+    Returns an empty list when the query shares no rare token with the allowed rows.
+    When allowed_indices is given, token frequencies are computed over those rows only, so a shop visited every week
+    is still rare among the rows of a given day.
+    limit=None returns every candidate.
+    """
+    postings = vendor_index['postings']
+    allowed = set(allowed_indices) if allowed_indices is not None else None
+    size = len(allowed) if allowed is not None else vendor_index['size']
+    # On small statements every token is "frequent", always allow a few rows per token
+    max_rows_per_token = max(3, int(max_document_frequency * size))
+
+    scores = defaultdict(float)
+    for token in description_tokens(indexed_description(vendor_index, query)):
+        rows = postings.get(token)
+        if rows and allowed is not None:
+            rows = rows & allowed
+        if not rows or len(rows) > max_rows_per_token:
+            continue
+        idf = math.log(size / len(rows)) + 1
+        for row_index in rows:
+            scores[row_index] += idf
+
+    ranked = sorted(scores, key=lambda row_index: scores[row_index], reverse=True)
+    return ranked[:limit] if limit is not None else ranked
@@ -0,0 +1,35 @@
+import pandas as pd
+from research.matching.vendor_index import build_vendor_index, block_candidates, normalize_description
+
+
+def test_normalize_description_strips_payment_noise():
+    assert normalize_description('CB*CARREFOUR MKT 12/03 CARTE 4974XXXX1234') == 'carrefour mkt'
+    assert normalize_description('PAYPAL *SPOTIFY 35314369001') == 'spotify'
+    assert normalize_description('PRLV SEPA EDF REF 123ABC') == 'edf'
+
+
+def test_build_vendor_index_memoizes_normalization_in_the_index():
+    vendor_index = build_vendor_index(pd.Series(['CB MONOPRIX 12/03', 'CB MONOPRIX 13/03', 'NETFLIX.COM']))
+    assert vendor_index['normalized'] == {'CB MONOPRIX 12/03': 'monoprix', 'CB MONOPRIX 13/03': 'monoprix',
+                                          'NETFLIX.COM': 'netflix com'}
+
+
+def test_trigrams_let_misread_vendors_share_tokens():
+    vendor_index = build_vendor_index(pd.Series(['CB CARREFOUR MKT', 'CB LECLERC', 'CB AUCHAN']))
+    assert block_candidates(vendor_index, 'Carref0ur Market') == [0]
+
+
+def test_allowed_indices_are_applied_before_the_limit():
+    # Many visits to the same shop tie on score, the row of the right day must not be cut by the limit
+    descriptions = [f'CB BOULANGERIE PAUL {day:02d}/03' for day in range(1, 32)]
+    descriptions += [f'CB SHOP {i}' for i in range(269)]
+    vendor_index = build_vendor_index(pd.Series(descriptions))
+    assert block_candidates(vendor_index, 'Boulangerie Paul', allowed_indices=[24, 40, 41], limit=None) == [24]
+
+
+def test_frequent_vendor_is_rare_among_allowed_rows():
+    # A shop visited every few days is frequent in the statement but not among the rows of one day
+    descriptions = [f'CB CARREFOUR {day:02d}/03' if day % 4 == 0 else f'CB SHOP {day} {day:02d}/03' for day in range(40)]
+    vendor_index = build_vendor_index(pd.Series(descriptions))
+    assert block_candidates(vendor_index, 'CARREFOUR', limit=None) == []
+    assert block_candidates(vendor_index, 'CARREFOUR', allowed_indices=[3, 4, 5], limit=None) == [4]
@@ -0,0 +1,145 @@
+import cv2
+import numpy as np
+
+# A 16x16 grid keeps the layout of the printed lines, an 8x8 one mostly sees the receipt outline
+HASH_SIZE = 16
+# Two receipts whose 256-bit dHash differ by at most this many bits are considered the same picture
+# (re-photographed, re-exported, recompressed...)
+HAMMING_THRESHOLD = 24
+# Receipts printed from the same template only differ by a few text lines and can fall within the hash threshold,
+# a hash hit is only dropped when the thumbnails are also almost identical pixel-wise
+THUMBNAIL_SIZE = (128, 256)
+PIXEL_CORRELATION_THRESHOLD = 0.95
+
+
+def dhash(image_path, hash_size=HASH_SIZE):
+    """
+    Computes the difference hash (dHash) of an image as an integer of hash_size * hash_size bits.
+    Returns None if the image could not be read.
+    """
+    # Decode directly at 1/8 resolution in grayscale, we only need a thumbnail
+    img = cv2.imread(image_path, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if img is None:
+        return None
+    resized = cv2.resize(img, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    # Each bit tells whether a pixel is brighter than its right neighbour
+    diff = resized[:, 1:] > resized[:, :-1]
+    value = 0
+    for bit in diff.flatten():
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming_distance(hash_a, hash_b):
+    return bin(hash_a ^ hash_b).count('1')
+
+
+def thumbnail(image_path, size=THUMBNAIL_SIZE):
+    """Returns the grayscale thumbnail of an image standardized to zero mean and unit variance, or None."""
+    img = cv2.imread(image_path, cv2.IMREAD_REDUCED_GRAYSCALE_2)
+    if img is None:
+        return None
+    resized = cv2.resize(img, size, interpolation=cv2.INTER_AREA).astype(np.float32)
+    return (resized - resized.mean()) / (resized.std() + 1e-6)
+
+
+def pixel_correlation(thumbnail_a, thumbnail_b):
+    """Pearson correlation between two standardized thumbnails, 1.0 for the same picture."""
+    return float((thumbnail_a * thumbnail_b).mean())
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over integer hashes, allows finding every hash within a given Hamming distance
+    without comparing against all the stored ones.
+    """
+
+    def __init__(self):
+        self.root = None  # (hash, key, {distance: child node})
+
+    def add(self, hash_value, key):
+        node = (hash_value, key, {})
+        if self.root is None:
+            self.root = node
+            return
+        current = self.root
+        while True:
+            distance = hamming_distance(hash_value, current[0])
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                return
+            current = child
+
+    def search(self, hash_value, max_distance):
+        """
+        Returns:
+            list: (distance, key) tuples for every stored hash within max_distance, closest first.
+        """
+        results = []
+        if self.root is None:
+            return results
+        to_visit = [self.root]
+        while to_visit:
+            node_hash, node_key, children = to_visit.pop()
+            distance = hamming_distance(hash_value, node_hash)
+            if distance <= max_distance:
+                results.append((distance, node_key))
+            # Triangle inequality: only the children in [distance - max, distance + max] can hold matches
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    to_visit.append(child)
+        results.sort()
+        return results
+
+
+def find_duplicate_images(image_paths, threshold=HAMMING_THRESHOLD, correlation_threshold=PIXEL_CORRELATION_THRESHOLD):
+    """
+    Groups near-duplicate images by perceptual hash, the first image of each group is kept as its representative.
+    A hash hit is confirmed on the pixels of a larger thumbnail, unconfirmed hits (same receipt template,
+    re-photographed copy...) are kept for the OCR and reported as suspected duplicates.
+    Returns:
+        tuple: (list of image paths to OCR,
+                dict mapping each duplicate path to its representative path,
+                dict mapping each suspected duplicate path to the closest representative path)
+    """
+    tree = BKTree()
+    representatives = []
+    duplicates = {}
+    suspected_duplicates = {}
+    thumbnails = {}
+
+    def get_thumbnail(image_path):
+        if image_path not in thumbnails:
+            thumbnails[image_path] = thumbnail(image_path)
+        return thumbnails[image_path]
+
+    for image_path in sorted(image_paths):
+        try:
+            hash_value = dhash(image_path)
+        except Exception as e:
+            print(f"Error hashing {image_path}: {e}")
+            hash_value = None
+        # Unreadable images are kept so that the OCR step reports them
+        if hash_value is None:
+            representatives.append(image_path)
+            continue
+
+        matches = tree.search(hash_value, threshold)
+        confirmed_path = None
+        for _, match_path in matches:
+            thumbnail_a, thumbnail_b = get_thumbnail(image_path), get_thumbnail(match_path)
+            if (thumbnail_a is not None and thumbnail_b is not None
+                    and pixel_correlation(thumbnail_a, thumbnail_b) >= correlation_threshold):
+                confirmed_path = match_path
+                break
+
+        if confirmed_path is not None:
+            duplicates[image_path] = confirmed_path
+            continue
+        if matches:
+            suspected_duplicates[image_path] = matches[0][1]
+        tree.add(hash_value, image_path)
+        representatives.append(image_path)
+
+    return representatives, duplicates, suspected_duplicates
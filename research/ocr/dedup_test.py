@@ -0,0 +1,96 @@
+import random
+import cv2
+import numpy as np
+from research.ocr import dedup
+
+RECEIPT_LINES = ['CARREFOUR MARKET', '12 RUE DE LA PAIX', '75002 PARIS', 'BAGUETTE     1,10', 'LAIT         0,95',
+                 'POMMES       2,30', 'TOTAL TTC    4,35', 'CB           4,35', '03/04/2024 12:31', 'MERCI DE VOTRE VISITE']
+# Same shop template, different purchase
+OTHER_RECEIPT_LINES = ['CARREFOUR MARKET', '12 RUE DE LA PAIX', '75002 PARIS', 'CAFE         3,50', 'FROMAGE      6,20',
+                       'VIN         12,90', 'TOTAL TTC   22,60', 'CB          22,60', '05/04/2024 18:02', 'MERCI DE VOTRE VISITE']
+
+
+def write_receipt(path, lines):
+    img = np.full((1600, 700), 235, np.uint8)
+    cv2.rectangle(img, (0, 0), (699, 1599), 200, 20)
+    for i, line in enumerate(lines):
+        cv2.putText(img, line, (40, 120 + i * 60), cv2.FONT_HERSHEY_SIMPLEX, 1.1, 20, 2)
+    cv2.imwrite(str(path), img)
+    return img
+
+
+def make_receipts(tmp_path):
+    original = write_receipt(tmp_path / 'a.jpg', RECEIPT_LINES)
+    # Re-exported copy: downscaled and recompressed
+    resized = cv2.resize(original, None, fx=0.6, fy=0.6, interpolation=cv2.INTER_AREA)
+    cv2.imwrite(str(tmp_path / 'b.jpg'), resized, [cv2.IMWRITE_JPEG_QUALITY, 40])
+    write_receipt(tmp_path / 'c.jpg', OTHER_RECEIPT_LINES)
+    return [str(tmp_path / name) for name in ('a.jpg', 'b.jpg', 'c.jpg')]
+
+
+def test_dhash_keeps_recompressed_copy_within_threshold(tmp_path):
+    original, copy, _ = make_receipts(tmp_path)
+    assert dedup.hamming_distance(dedup.dhash(original), dedup.dhash(copy)) <= dedup.HAMMING_THRESHOLD
+
+
+def test_same_template_receipts_are_only_suspected_duplicates(tmp_path):
+    original, copy, other = make_receipts(tmp_path)
+
+    representatives, duplicates, suspected_duplicates = dedup.find_duplicate_images([other, copy, original])
+
+    # The hash alone cannot tell receipts printed from the same template apart, the pixels can
+    assert dedup.pixel_correlation(dedup.thumbnail(original), dedup.thumbnail(copy)) >= dedup.PIXEL_CORRELATION_THRESHOLD
+    assert dedup.pixel_correlation(dedup.thumbnail(original), dedup.thumbnail(other)) < dedup.PIXEL_CORRELATION_THRESHOLD
+    assert representatives == [original, other]
+    assert duplicates == {copy: original}
+    assert suspected_duplicates == {other: original}
+
+
+def test_bk_tree_search_matches_brute_force():
+    rng = random.Random(0)
+    hashes = [rng.getrandbits(256) for _ in range(300)]
+    # Add near copies so that some searches have several hits
+    hashes += [hashes[i] ^ (1 << rng.randrange(256)) ^ (1 << rng.randrange(256)) for i in range(50)]
+    tree = dedup.BKTree()
+    for key, hash_value in enumerate(hashes):
+        tree.add(hash_value, key)
+
+    for query in hashes[:20] + [rng.getrandbits(256) for _ in range(20)]:
+        for max_distance in (0, 5, 24, 120):
+            expected = sorted((dedup.hamming_distance(query, hash_value), key)
+                              for key, hash_value in enumerate(hashes)
+                              if dedup.hamming_distance(query, hash_value) <= max_distance)
+            assert tree.search(query, max_distance) == expected
+
+
+def test_find_duplicate_images_keeps_first_path_as_representative(monkeypatch):
+    base = (1 << 200) - 1
+    hashes = {
+        'receipts/b.jpg': base,
+        'receipts/a.jpg': base ^ 0b111,  # 3 bits away from b.jpg
+        'receipts/c.jpg': base ^ ((1 << 100) - 1),  # Different receipt
+        'receipts/d.jpg': None,  # Unreadable image
+        'receipts/e.jpg': base ^ ((1 << 100) - 1) ^ 1,
+    }
+    monkeypatch.setattr(dedup, 'dhash', lambda image_path: hashes[image_path])
+    # Every hash hit is confirmed on the pixels
+    monkeypatch.setattr(dedup, 'thumbnail', lambda image_path: np.ones(4))
+
+    representatives, duplicates, suspected_duplicates = dedup.find_duplicate_images(list(hashes))
+
+    assert representatives == ['receipts/a.jpg', 'receipts/c.jpg', 'receipts/d.jpg']
+    assert duplicates == {'receipts/b.jpg': 'receipts/a.jpg', 'receipts/e.jpg': 'receipts/c.jpg'}
+    assert suspected_duplicates == {}
+
+
+def test_unconfirmed_hash_hit_is_kept_for_ocr(monkeypatch):
+    hashes = {'receipts/a.jpg': 0, 'receipts/b.jpg': 0b11}
+    thumbnails = {'receipts/a.jpg': np.array([1.0, -1.0]), 'receipts/b.jpg': np.array([-1.0, 1.0])}
+    monkeypatch.setattr(dedup, 'dhash', lambda image_path: hashes[image_path])
+    monkeypatch.setattr(dedup, 'thumbnail', lambda image_path: thumbnails[image_path])
+
+    representatives, duplicates, suspected_duplicates = dedup.find_duplicate_images(list(hashes))
+
+    assert representatives == ['receipts/a.jpg', 'receipts/b.jpg']
+    assert duplicates == {}
+    assert suspected_duplicates == {'receipts/b.jpg': 'receipts/a.jpg'}
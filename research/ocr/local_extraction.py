@@ -0,0 +1,152 @@
+import asyncio
+import re
+from dateutil import parser
+import pytesseract
+from research.ocr.ocr_extraction import ExtractedData, preprocess_image
+
+# Keywords announcing the amount actually paid, best first: a line with 'a payer' or 'TTC' wins over a plain 'total'
+TOTAL_KEYWORDS = [
+    re.compile(r'\b(net a payer|a payer|à payer|ttc|amount due|balance due|grand total)\b', re.IGNORECASE),
+    re.compile(r'\b(total|montant)\b', re.IGNORECASE),
+]
+# Sub-totals, taxes, tendered amounts (cash, card), change and loyalty lines are not the amount paid
+EXCLUDED_KEYWORDS = re.compile(r'\b(sous[- ]?total|sub[- ]?total|subtotal|ht|tva|vat|tax|rendu|change|especes|espèces|'
+                               r'cash|cb|carte|card|points?|fidelite|fidélité|loyalty)\b', re.IGNORECASE)
+AMOUNT_PATTERN = re.compile(r'(?<![\d.,])(\d+(?:[.,]\d{3})*[.,]\d{2})(?!\d)')
+DATE_PATTERNS = [
+    re.compile(r'\b(\d{4}[-/.]\d{1,2}[-/.]\d{1,2})\b'),  # YYYY-MM-DD
+    re.compile(r'\b(\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4})\b'),  # DD/MM/YYYY, French receipts put the day first
+]
+CURRENCY_PATTERNS = [
+    (re.compile(r'€|\bEUR\b|\beuros?\b', re.IGNORECASE), 'EUR'),
+    (re.compile(r'£|\bGBP\b'), 'GBP'),
+    (re.compile(r'\bCHF\b'), 'CHF'),
+    (re.compile(r'\$|\bUSD\b'), 'USD'),
+]
+
+
+def parse_amount(amount_str):
+    """Converts '1234,56', '1.234,56' or '1,234.56' to a float."""
+    digits = re.sub(r'[.,]', '', amount_str)
+    return int(digits) / 100
+
+
+def find_total(lines):
+    """
+    Returns (total paid, index of the line it was read on), or (None, None).
+    Lines are searched by keyword rank, within a rank the largest amount is kept since totals are above partial sums.
+    """
+    for keywords in TOTAL_KEYWORDS:
+        candidates = []
+        for line_index, line in enumerate(lines):
+            if not keywords.search(line) or EXCLUDED_KEYWORDS.search(line):
+                continue
+            amounts = AMOUNT_PATTERN.findall(line)
+            if amounts:
+                candidates.append((parse_amount(amounts[-1]), line_index))
+        if candidates:
+            return max(candidates)
+    return None, None
+
+
+def extract_total(lines):
+    """Returns the total paid found in the receipt lines, or None."""
+    return find_total(lines)[0]
+
+
+def find_date(lines):
+    """Returns (date as YYYY-MM-DD, index of the line it was read on), or ('', None)."""
+    for pattern in DATE_PATTERNS:
+        for line_index, line in enumerate(lines):
+            for date_str in pattern.findall(line):
+                try:
+                    dayfirst = not re.match(r'\d{4}', date_str)
+                    return parser.parse(date_str, dayfirst=dayfirst).strftime('%Y-%m-%d'), line_index
+                except Exception:
+                    continue
+    return '', None
+
+
+def extract_date(text):
+    return find_date(text.split('\n'))[0]
+
+
+def extract_currency(text):
+    for pattern, currency in CURRENCY_PATTERNS:
+        if pattern.search(text):
+            return currency
+    return None
+
+
+def extract_store_name(lines):
+    # The store name is usually printed first, skip lines made only of symbols or numbers
+    for line in lines:
+        if re.search(r'[A-Za-z]{3,}', line):
+            return line.strip()
+    return ''
+
+
+def field_confidence(line_words):
+    """
+    Confidence (0-1) of a value read on a line, given as (word, confidence 0-100) tuples.
+    The weakest word holding digits decides, a single misread digit is enough to get the amount or date wrong.
+    """
+    confidences = [confidence for word, confidence in line_words if any(char.isdigit() for char in word)]
+    if not confidences:
+        confidences = [confidence for _, confidence in line_words]
+    return min(confidences) / 100 if confidences else 0.0
+
+
+def run_tesseract(image_path):
+    """
+    Runs Tesseract on the thresholded image.
+    Returns:
+        list: The text lines, each one a list of (word, confidence between 0 and 100) tuples.
+    """
+    thresh = preprocess_image(image_path)
+    ocr_data = pytesseract.image_to_data(thresh, output_type=pytesseract.Output.DICT)
+
+    lines = {}
+    for i, word in enumerate(ocr_data['text']):
+        word = word.strip()
+        confidence = float(ocr_data['conf'][i])
+        if not word or confidence < 0:
+            continue
+        key = (ocr_data['block_num'][i], ocr_data['par_num'][i], ocr_data['line_num'][i])
+        lines.setdefault(key, []).append((word, confidence))
+
+    return [line_words for _, line_words in sorted(lines.items())]
+
+
+async def local_ocr_extraction(image_path):
+    """
+    Extracts the receipt data with Tesseract and regex heuristics, without any API call.
+    The confidence only looks at the words the total and the date were read from, not at the whole page.
+    Returns:
+        tuple: (ExtractedData or None if no total was found, confidence between 0 and 1)
+    """
+    # Tesseract is CPU bound, run it in a thread so the other receipts keep being processed
+    line_words = await asyncio.to_thread(run_tesseract, image_path)
+    lines = [' '.join(word for word, _ in words) for words in line_words]
+    text = '\n'.join(lines)
+
+    total_price, total_line = find_total(lines)
+    if total_price is None:
+        return None, 0.0
+    confidence = field_confidence(line_words[total_line])
+
+    date_of_purchase, date_line = find_date(lines)
+    if date_of_purchase:
+        confidence = min(confidence, field_confidence(line_words[date_line]))
+    else:
+        # A receipt without a readable date is less reliable for matching
+        confidence *= 0.8
+
+    data = ExtractedData(
+        date_of_purchase=date_of_purchase,
+        name_of_store=extract_store_name(lines),
+        address='',
+        total_price=total_price,
+        currency=extract_currency(text),
+    )
+    return data, confidence
@@ -0,0 +1,76 @@
+import asyncio
+from research.ocr import local_extraction
+from research.ocr.local_extraction import parse_amount, extract_total, extract_date, extract_currency, field_confidence
+
+
+def test_parse_amount_handles_separators():
+    assert parse_amount('12,50') == 12.5
+    assert parse_amount('1234.56') == 1234.56
+    assert parse_amount('1.234,56') == 1234.56
+    assert parse_amount('1,234.56') == 1234.56
+
+
+def test_extract_total_keeps_ttc_over_ht():
+    lines = ['CARREFOUR MARKET', 'TOTAL HT 10,00', 'TVA 20% 2,00', 'TOTAL TTC 12,00 EUR', 'CB 12,00']
+    assert extract_total(lines) == 12.0
+
+
+def test_extract_total_ignores_subtotal_tax_and_change():
+    lines = ['SOUS-TOTAL 80,00', 'TOTAL TVA 16,00', 'MONTANT A PAYER 96,00', 'ESPECES 100,00', 'MONTANT RENDU 104,00']
+    assert extract_total(lines) == 96.0
+
+
+def test_extract_total_prefers_amount_to_pay_over_tendered_amount():
+    assert extract_total(['TOTAL A PAYER EUR 18,90', 'MONTANT CB 20,00']) == 18.9
+    assert extract_total(['TOTAL 18,90', 'ESPECES 20,00', 'RENDU 1,10']) == 18.9
+
+
+def test_extract_total_ignores_loyalty_lines():
+    assert extract_total(['Total 23,40', 'Total remise fidelite 150,00']) == 23.4
+    assert extract_total(['TOTAL 23,40', 'TOTAL POINTS 150,00']) == 23.4
+
+
+def test_extract_total_ranks_ttc_over_plain_total():
+    assert extract_total(['TOTAL 10,00', 'TOTAL TTC (taxes incluses) 12,00']) == 12.0
+    assert extract_total(['TOTAL TTC (taxes incluses) 12,00']) == 12.0
+
+
+def test_extract_total_with_thousands_separator():
+    assert extract_total(['TOTAL 1.234,56']) == 1234.56
+    assert extract_total(['Amount due: $1,234.56']) == 1234.56
+
+
+def test_extract_total_without_keyword():
+    assert extract_total(['BAGUETTE 1,10', 'CROISSANT 1,30']) is None
+
+
+def test_extract_date_is_dayfirst_unless_iso():
+    assert extract_date('Le 03/04/2024 12:30') == '2024-04-03'
+    assert extract_date('03-04-24') == '2024-04-03'
+    assert extract_date('2024-05-06') == '2024-05-06'
+    assert extract_date('no date here') == ''
+
+
+def test_extract_currency():
+    assert extract_currency('TOTAL 12,00 €') == 'EUR'
+    assert extract_currency('TOTAL $12.00') == 'USD'
+    assert extract_currency('TOTAL 12.00') is None
+
+
+def test_field_confidence_uses_the_weakest_digit_word():
+    assert field_confidence([('TOTAL', 96.0), ('TTC', 95.0), ('12,00', 41.0)]) == 0.41
+    assert field_confidence([('TOTAL', 90.0)]) == 0.9
+    assert field_confidence([]) == 0.0
+
+
+def test_confidence_comes_from_the_total_and_date_words(monkeypatch):
+    clean_page = [[('CARREFOUR', 96.0), ('MARKET', 95.0)], [('BAGUETTE', 97.0), ('1,10', 96.0)],
+                  [('TOTAL', 96.0), ('TTC', 95.0), ('18,90', 38.0)], [('03/04/2024', 92.0)]]
+    monkeypatch.setattr(local_extraction, 'run_tesseract', lambda image_path: clean_page)
+
+    data, confidence = asyncio.run(local_extraction.local_ocr_extraction('receipt.jpg'))
+
+    assert data.total_price == 18.9
+    assert data.date_of_purchase == '2024-04-03'
+    # The page is clean but the total digits are not, the receipt must be escalated
+    assert confidence == 0.38
@@ -1,24 +1,33 @@
 import asyncio
-from research.ocr.ocr_extraction import ocr_extraction  # Your OCR logic
+from research.ocr.tiered_ocr import tiered_ocr_extraction, new_tier_stats, report_tier_stats  # Your OCR logic
+from research.ocr.dedup import find_duplicate_images
 import glob
+import os
 import time
 import pandas as pd
 
-async def retrieve_data_from_images(folder_path, rate_limit=50, period=2):  #Images processed every 60 seconds (default)
+async def retrieve_data_from_images(folder_path, rate_limit=50, period=2, deduplicate=True, statement_amounts=None):  #Images processed every 60 seconds (default)
     """
     Asynchronously retrieves data from images in a folder, respecting rate limits.
+    Near-duplicate images are detected beforehand and only one image per group is sent to the OCR,
+    images that only look alike (same receipt template...) are still sent and reported as suspected duplicates.
+    Each image is read by the local OCR first and only escalated to the LLM when the result is not reliable,
+    statement_amounts (set of amounts rounded to 2 decimals) allows escalating totals absent from the bank statement.
     Returns:
-        dict: A dictionary where the keys are image file paths and the values are the extracted data.
+        tuple: (dict where the keys are image file paths and the values are the extracted data,
+                dict mapping each skipped duplicate image path to the image path it duplicates,
+                dict mapping each suspected duplicate image path to the image path it looks like)
     """
 
     all_data = {}
+    tier_stats = new_tier_stats()
     semaphore = asyncio.Semaphore(rate_limit)  # Limit concurrent tasks
 
     async def process_image(file_path):
         async with semaphore:  # Acquire semaphore before processing
             start_time = time.time()
             try:
-                data = await ocr_extraction(file_path)  # Await the async OCR extraction
+                data = await tiered_ocr_extraction(file_path, statement_amounts, tier_stats)  # Await the async OCR extraction
                 return file_path, data
             except Exception as e:
                 print(f"Error processing {file_path}: {e}")
@@ -32,20 +41,31 @@ async def retrieve_data_from_images(folder_path, rate_limit=50, period=2):  #Ima
 
 
 
-    tasks = [asyncio.create_task(process_image(file_path)) for file_path in glob.glob(folder_path + '/*.jpg')]
+    image_paths = glob.glob(folder_path + '/*.jpg')
+    duplicates = {}
+    suspected_duplicates = {}
+    if deduplicate:
+        image_paths, duplicates, suspected_duplicates = find_duplicate_images(image_paths)
+        for duplicate_path, original_path in duplicates.items():
+            print(f"Skipping {duplicate_path}: duplicate of {original_path}")
+        for duplicate_path, original_path in suspected_duplicates.items():
+            print(f"Possible duplicate: {duplicate_path} looks like {original_path}")
+
+    tasks = [asyncio.create_task(process_image(file_path)) for file_path in image_paths]
 
     for future in asyncio.as_completed(tasks):
         file_path, data = await future
         all_data[file_path] = data
 
-    return all_data
+    report_tier_stats(tier_stats)
+    return all_data, duplicates, suspected_duplicates
 
-async def mistral_ocr(folder_path):
+async def mistral_ocr(folder_path, statement_amounts=None):
     # nb_files = len(glob.glob(folder_path))
     # for file in glob.glob(folder_path):
     #     print(f'file = {file}')
     # print(f'received {folder_path} as folder_path with {nb_files} files')
-    data_for_restructuring = await retrieve_data_from_images(folder_path)
+    data_for_restructuring, duplicates, suspected_duplicates = await retrieve_data_from_images(folder_path, statement_amounts=statement_amounts)
     print(data_for_restructuring)
     wrong_keys = []
     for key, value in data_for_restructuring.items():
@@ -60,6 +80,13 @@ async def mistral_ocr(folder_path):
         'address' : [value.address for _, value in data_for_restructuring.items()],
         'total_price' : [value.total_price for _, value in data_for_restructuring.items()],
         'currency' : [value.currency for _, value in data_for_restructuring.items()],
+        # Looks like another receipt but could not be confirmed as the same picture, matched like any other receipt
+        'suspected_duplicate_of' : [os.path.basename(suspected_duplicates.get(key, '')) for key in data_for_restructuring.keys()],
     }
     df = pd.DataFrame(structured_data)
+    # Duplicates are not matched, keep them around so they can be shown to the user
+    df.attrs['duplicates'] = {os.path.basename(duplicate): os.path.basename(original)
+                              for duplicate, original in duplicates.items()}
+    df.attrs['suspected_duplicates'] = {os.path.basename(duplicate): os.path.basename(original)
+                                        for duplicate, original in suspected_duplicates.items()}
     return df
\ No newline at end of file
@@ -10,26 +10,33 @@ import os
 import cv2
 import streamlit as st
 
+# 1. Define Pydantic Output Model
+class ExtractedData(BaseModel):
+    """Represents extracted data from a document."""
+
+    date_of_purchase: date | str = Field(description="The date found in the document (YYYY-MM-DD). If not date is found return an empty string")
+    name_of_store: str = Field(description="The name of the vendor or store in the document")
+    address: str = Field(description="The full address found in the document.")
+    total_price: float = Field(description="The total price found in the document.")
+    currency: str | None = Field(description="The currency of the total price (e.g., USD, EUR, GBP) Do not make it up if not present.")
+
+
+def preprocess_image(image_path):
+    """Loads an image in grayscale and binarizes it with Otsu thresholding."""
+    img = cv2.imread(image_path)
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    return thresh
+
+
 async def ocr_extraction(image_path):
     dotenv.load_dotenv()
     MISTRAL_API_KEY = st.secrets['MISTRAL_API_KEY']
 
-    # 1. Define Pydantic Output Model
-    class ExtractedData(BaseModel):
-        """Represents extracted data from a document."""
-
-        date_of_purchase: date | str = Field(description="The date found in the document (YYYY-MM-DD). If not date is found return an empty string")
-        name_of_store: str = Field(description="The name of the vendor or store in the document")
-        address: str = Field(description="The full address found in the document.")
-        total_price: float = Field(description="The total price found in the document.")
-        currency: str | None = Field(description="The currency of the total price (e.g., USD, EUR, GBP) Do not make it up if not present.")
-
     # 2. Image to Base64 Encoding (if needed) - Moved here for clarity
     async def encode_and_preprocess_image_to_base64(image_path):
         """Encodes an image from a file path to a base64 string."""
-        img = cv2.imread(image_path)
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        thresh = preprocess_image(image_path)
         try:
                 _, buffer = cv2.imencode('.jpg', thresh)
                 return base64.b64encode(buffer).decode('utf-8')
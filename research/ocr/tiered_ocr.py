@@ -0,0 +1,87 @@
+import time
+from research.ocr.ocr_extraction import ocr_extraction
+from research.ocr.local_extraction import local_ocr_extraction
+
+# Minimum confidence (0-1) for the local engine result to be kept without asking the LLM
+LOCAL_CONFIDENCE_THRESHOLD = 0.7
+
+
+async def llm_ocr_extraction(image_path):
+    """Wraps the Mistral OCR into the backend interface, its result is always trusted."""
+    return await ocr_extraction(image_path), 1.0
+
+
+# An OCR backend is an async function taking an image path and returning (ExtractedData or None, confidence).
+# Tiers are tried in order, a result is kept when its confidence reaches the tier threshold,
+# the last tier is always kept.
+OCR_TIERS = [
+    ('local', local_ocr_extraction, LOCAL_CONFIDENCE_THRESHOLD),
+    ('llm', llm_ocr_extraction, 0.0),
+]
+
+
+def new_tier_stats(tiers=OCR_TIERS):
+    # 'seconds' sums the latency of each image, 'first_start'/'last_end' give the wall-clock time of the tier
+    return {name: {'processed': 0, 'accepted': 0, 'escalated': 0, 'errors': 0, 'seconds': 0.0,
+                   'first_start': None, 'last_end': None} for name, _, _ in tiers}
+
+
+def amount_in_statement(total_price, statement_amounts):
+    if statement_amounts is None:
+        return True
+    return round(total_price, 2) in statement_amounts
+
+
+async def tiered_ocr_extraction(image_path, statement_amounts=None, tier_stats=None, tiers=OCR_TIERS):
+    """
+    Extracts the receipt data with the cheapest backend that gives a trustworthy result.
+    A result is escalated to the next tier when its confidence is too low or, if statement_amounts is given,
+    when its total has no candidate in the bank statement.
+    Returns:
+        ExtractedData: The extracted data, or None if no tier could extract it.
+    """
+    if tier_stats is None:
+        tier_stats = new_tier_stats(tiers)
+
+    for tier_index, (name, backend, threshold) in enumerate(tiers):
+        is_last_tier = tier_index == len(tiers) - 1
+        stats = tier_stats[name]
+        start_time = time.time()
+        if stats['first_start'] is None or start_time < stats['first_start']:
+            stats['first_start'] = start_time
+        try:
+            data, confidence = await backend(image_path)
+        except Exception as e:
+            # A failing tier (missing binary, API error...) should not prevent the next one from running
+            stats['errors'] += 1
+            if is_last_tier:
+                raise
+            print(f"Error in {name} OCR for {image_path}: {e}")
+            continue
+        finally:
+            end_time = time.time()
+            stats['processed'] += 1
+            stats['seconds'] += end_time - start_time
+            if stats['last_end'] is None or end_time > stats['last_end']:
+                stats['last_end'] = end_time
+
+        if is_last_tier or (data is not None
+                            and confidence >= threshold
+                            and amount_in_statement(data.total_price, statement_amounts)):
+            stats['accepted'] += 1
+            return data
+        stats['escalated'] += 1
+
+    return None
+
+
+def report_tier_stats(tier_stats):
+    """Prints the latency and throughput of each OCR tier, to tune the cost/latency trade-off."""
+    for name, stats in tier_stats.items():
+        mean_latency = stats['seconds'] / stats['processed'] if stats['processed'] else 0.0
+        # Images run concurrently, the throughput is computed on the wall-clock time of the tier
+        wall_clock = stats['last_end'] - stats['first_start'] if stats['processed'] else 0.0
+        throughput = stats['processed'] / wall_clock if wall_clock > 0 else 0.0
+        print(f"[{name} OCR] {stats['processed']} images in {wall_clock:.2f}s, throughput {throughput:.2f} images/s, "
+              f"mean latency {mean_latency:.2f}s, "
+              f"{stats['accepted']} accepted, {stats['escalated']} escalated, {stats['errors']} errors")
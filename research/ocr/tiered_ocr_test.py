@@ -0,0 +1,66 @@
+import asyncio
+from research.ocr.ocr_extraction import ExtractedData
+from research.ocr.tiered_ocr import tiered_ocr_extraction, new_tier_stats
+
+
+def receipt(total_price):
+    return ExtractedData(date_of_purchase='2024-04-03', name_of_store='CARREFOUR', address='',
+                         total_price=total_price, currency='EUR')
+
+
+def make_tiers(local_result):
+    calls = []
+
+    async def local_backend(image_path):
+        calls.append('local')
+        if isinstance(local_result, Exception):
+            raise local_result
+        return local_result
+
+    async def llm_backend(image_path):
+        calls.append('llm')
+        return receipt(99.0), 1.0
+
+    return [('local', local_backend, 0.7), ('llm', llm_backend, 0.0)], calls
+
+
+def run(local_result, statement_amounts=None):
+    tiers, calls = make_tiers(local_result)
+    tier_stats = new_tier_stats(tiers)
+    data = asyncio.run(tiered_ocr_extraction('receipt.jpg', statement_amounts, tier_stats, tiers))
+    return data, calls, tier_stats
+
+
+def test_confident_local_result_is_kept():
+    data, calls, tier_stats = run((receipt(12.5), 0.9), statement_amounts={12.5})
+    assert data.total_price == 12.5
+    assert calls == ['local']
+    assert tier_stats['local']['accepted'] == 1
+
+
+def test_low_confidence_is_escalated():
+    data, calls, tier_stats = run((receipt(12.5), 0.5))
+    assert data.total_price == 99.0
+    assert calls == ['local', 'llm']
+    assert tier_stats['local']['escalated'] == 1
+    assert tier_stats['llm']['accepted'] == 1
+
+
+def test_missing_total_is_escalated():
+    data, calls, _ = run((None, 0.0))
+    assert data.total_price == 99.0
+    assert calls == ['local', 'llm']
+
+
+def test_amount_not_in_statement_is_escalated():
+    data, calls, _ = run((receipt(13.0), 0.9), statement_amounts={12.5})
+    assert data.total_price == 99.0
+    assert calls == ['local', 'llm']
+
+
+def test_failing_local_tier_falls_back_to_llm():
+    data, calls, tier_stats = run(RuntimeError('tesseract is not installed'))
+    assert data.total_price == 99.0
+    assert calls == ['local', 'llm']
+    assert tier_stats['local']['errors'] == 1
+    assert tier_stats['local']['processed'] == 1